@@ -9,56 +9,94 @@ from __future__ import annotations
 
 import argparse
 import csv
+import os
 import re
-from dataclasses import dataclass
+import sys
+from collections import defaultdict
 from pathlib import Path
+from typing import Iterator, NamedTuple
 
+from descargar_faltantes import walk_nc
 
+
+# variable_table_source_experiment_sYYYY-ensamble_grid_timerange.nc
+# Grupos por posicion: 1=source, 2=anio, 3=ensamble
+# MULTILINE y [^_\n]: se recorren con finditer todos los nombres unidos por
+# saltos de linea sin que una coincidencia cruce de un nombre al siguiente
 PATRON_NOMBRE = re.compile(
-    r"^(?P<variable>\w+)_(?P<table>\w+)_(?P<source>[^_]+)_"
-    r"(?P<experiment>[^_]+)_(?P<member>[^_]+)_(?P<grid>[^_]+)_"
-    r"(?P<timerange>[^_]+)\.nc$"
+    r"^[^_\n]+_[^_\n]+_([^_\n]+)_[^_\n]+_s(\d{4})-(r[^_\n]+)_[^_\n]+_[^_\n]+\.nc$",
+    re.MULTILINE,
+)
+
+# Buffer de escritura de los CSV de salida (1 MiB)
+BUFFER_CSV = 1 << 20
+
+# Columnas del CSV de salida; cada fila de `calcular_faltantes` es una tupla en este orden
+CAMPOS = (
+    "modelo",
+    "ensamble",
+    "anio_min_detectado",
+    "anio_max_detectado",
+    "anio_inicio_esperado",
+    "anio_fin_esperado",
+    "anios_presentes",
+    "anios_esperados",
+    "anios_faltantes",
+    "lista_anios_faltantes",
 )
-PATRON_ANIO_MEMBER = re.compile(r"s(?P<anio>\d{4})")
 
+# Fila de salida: una tupla con los valores de CAMPOS
+Fila = tuple[str, str, int, int, int, int, int, int, int, str]
 
-@dataclass(frozen=True)
-class Registro:
+
+class Registro(NamedTuple):
     modelo: str
     ensamble: str
     anio: int
 
 
-def extraer_registro(path_nc: Path) -> Registro | None:
-    """Extrae modelo, ensamble y anio de inicializacion desde el nombre."""
-    match_nombre = PATRON_NOMBRE.match(path_nc.name)
-    if not match_nombre:
-        return None
+def walk_nc_names(raiz: str) -> Iterator[str]:
+    """Produce el nombre de cada .nc bajo `raiz` (solo el nombre, sin crear Path)."""
+    return (entrada.name for entrada in walk_nc(raiz))
 
-    modelo = match_nombre.group("source")
-    member = match_nombre.group("member")
 
-    match_anio = PATRON_ANIO_MEMBER.search(member)
-    if not match_anio:
-        return None
+def extraer_registros(nombres: list[str]) -> Iterator[Registro]:
+    """Extrae modelo, ensamble y anio de inicializacion de los nombres de .nc.
 
-    ensamble = member.split("-", 1)[1] if "-" in member else member
-    return Registro(modelo=modelo, ensamble=ensamble, anio=int(match_anio.group("anio")))
+    Los nombres que no siguen el patron se ignoran. Los nombres se unen con
+    saltos de linea y se recorren con finditer, de modo que el motor de
+    expresiones regulares se invoca una vez y no por archivo.
+    """
+    for match in PATRON_NOMBRE.finditer("\n".join(nombres)):
+        # modelo y ensamble se repiten en miles de archivos: se internan para
+        # compartir una sola copia y acelerar la agrupacion por (modelo, ensamble)
+        yield Registro(
+            modelo=sys.intern(match[1]), ensamble=sys.intern(match[3]), anio=int(match[2])
+        )
+
+
+def anios_de_mascara(mascara: int) -> list[int]:
+    """Devuelve en orden ascendente los anios cuyo bit esta activo (bit n = anio n)."""
+    anios: list[int] = []
+    while mascara:
+        bit_bajo = mascara & -mascara
+        anios.append(bit_bajo.bit_length() - 1)
+        mascara ^= bit_bajo
+    return anios
 
 
 def calcular_faltantes(
-    registros: list[Registro], inicio: int | None, fin: int | None
-) -> list[dict[str, str | int]]:
-    """Calcula anios faltantes por combinacion modelo+ensamble."""
-    por_modelo_ensamble: dict[tuple[str, str], set[int]] = {}
-    for registro in registros:
-        clave = (registro.modelo, registro.ensamble)
-        por_modelo_ensamble.setdefault(clave, set()).add(registro.anio)
-
-    filas: list[dict[str, str | int]] = []
-    for (modelo, ensamble), anios_presentes in sorted(por_modelo_ensamble.items()):
-        min_detectado = min(anios_presentes)
-        max_detectado = max(anios_presentes)
+    por_modelo_ensamble: dict[tuple[str, str], int], inicio: int | None, fin: int | None
+) -> list[Fila]:
+    """Calcula anios faltantes por combinacion modelo+ensamble (filas en orden CAMPOS).
+
+    Los anios presentes de cada combinacion llegan como una mascara de bits
+    (bit n = anio n), de modo que los faltantes salen de `esperados & ~presentes`.
+    """
+    filas: list[Fila] = []
+    for (modelo, ensamble), presentes in sorted(por_modelo_ensamble.items()):
+        min_detectado = (presentes & -presentes).bit_length() - 1
+        max_detectado = presentes.bit_length() - 1
 
         inicio_esperado = inicio if inicio is not None else min_detectado
         fin_esperado = fin if fin is not None else max_detectado
@@ -68,48 +106,36 @@ def calcular_faltantes(
                 f"Rango invalido para {modelo}: inicio={inicio_esperado}, fin={fin_esperado}."
             )
 
-        anios_esperados = set(range(inicio_esperado, fin_esperado + 1))
-        faltantes = sorted(anios_esperados - anios_presentes)
+        n_esperados = fin_esperado - inicio_esperado + 1
+        esperados = ((1 << n_esperados) - 1) << inicio_esperado
+        faltantes = anios_de_mascara(esperados & ~presentes)
 
         filas.append(
-            {
-                "modelo": modelo,
-                "ensamble": ensamble,
-                "anio_min_detectado": min_detectado,
-                "anio_max_detectado": max_detectado,
-                "anio_inicio_esperado": inicio_esperado,
-                "anio_fin_esperado": fin_esperado,
-                "anios_presentes": len(anios_presentes),
-                "anios_esperados": len(anios_esperados),
-                "anios_faltantes": len(faltantes),
-                "lista_anios_faltantes": ",".join(str(anio) for anio in faltantes),
-            }
+            (
+                modelo,
+                ensamble,
+                min_detectado,
+                max_detectado,
+                inicio_esperado,
+                fin_esperado,
+                presentes.bit_count(),
+                n_esperados,
+                len(faltantes),
+                ",".join(str(anio) for anio in faltantes),
+            )
         )
 
     return filas
 
 
-def guardar_csv(filas: list[dict[str, str | int]], ruta_salida: Path) -> None:
+def guardar_csv(filas: list[Fila], ruta_salida: Path) -> None:
     """Guarda el reporte en CSV."""
     ruta_salida.parent.mkdir(parents=True, exist_ok=True)
 
-    campos = [
-        "modelo",
-        "ensamble",
-        "anio_min_detectado",
-        "anio_max_detectado",
-        "anio_inicio_esperado",
-        "anio_fin_esperado",
-        "anios_presentes",
-        "anios_esperados",
-        "anios_faltantes",
-        "lista_anios_faltantes",
-    ]
-
-    with ruta_salida.open("w", newline="", encoding="utf-8") as archivo:
-        writer = csv.DictWriter(archivo, fieldnames=campos)
-        writer.writeheader()
-        writer.writerows(filas)
+    with ruta_salida.open(
+        "w", newline="", encoding="utf-8", buffering=BUFFER_CSV
+    ) as archivo:
+        csv.writer(archivo).writerows([CAMPOS, *filas])
 
 
 def main() -> None:
@@ -151,22 +177,21 @@ def main() -> None:
     )
     args = parser.parse_args()
 
-    base = Path(args.directorio)
-    if not base.exists():
+    base = args.directorio
+    if not os.path.exists(base):
         raise FileNotFoundError(f"El directorio no existe: {base}")
 
     filtro = args.filtro_modelo.lower() if args.filtro_modelo else None
-    registros: list[Registro] = []
+    # (modelo, ensamble) -> mascara de anios presentes, rellenada durante el recorrido
+    por_modelo_ensamble: dict[tuple[str, str], int] = defaultdict(int)
 
-    for archivo_nc in base.rglob("*.nc"):
-        registro = extraer_registro(archivo_nc)
-        if registro is None:
-            continue
+    nombres = list(walk_nc_names(base))
+    for registro in extraer_registros(nombres):
         if filtro and filtro not in registro.modelo.lower():
             continue
-        registros.append(registro)
+        por_modelo_ensamble[(registro.modelo, registro.ensamble)] |= 1 << registro.anio
 
-    if not registros:
+    if not por_modelo_ensamble:
         if args.filtro_modelo:
             print(
                 f"No se encontraron archivos .nc para modelos que contengan '{args.filtro_modelo}'."
@@ -175,15 +200,15 @@ def main() -> None:
             print("No se encontraron archivos .nc con patron reconocido.")
         return
 
-    filas = calcular_faltantes(registros, inicio=args.inicio, fin=args.fin)
+    filas = calcular_faltantes(por_modelo_ensamble, inicio=args.inicio, fin=args.fin)
     ruta_salida = Path(args.salida)
     guardar_csv(filas, ruta_salida)
 
     print(f"CSV generado en: {ruta_salida}")
-    for fila in filas:
+    for modelo, ensamble, *_, presentes, esperados, faltantes, _ in filas:
         print(
-            f"- {fila['modelo']} | {fila['ensamble']}: {fila['anios_faltantes']} anios faltantes "
-            f"(esperados {fila['anios_esperados']}, presentes {fila['anios_presentes']})"
+            f"- {modelo} | {ensamble}: {faltantes} anios faltantes "
+            f"(esperados {esperados}, presentes {presentes})"
         )
 
 
@@ -15,27 +15,55 @@ Estructura de salida:
 import os
 import re
 import csv
+import json
+import time
+import queue
+import atexit
+import pickle
 import shutil
+import hashlib
 import logging
+import logging.handlers
 import argparse
+import tempfile
+import subprocess
 from pathlib import Path
 from datetime import datetime
-from dataclasses import dataclass, asdict
-from typing import Dict, Any, List, Optional, Set, Tuple
-
+from collections import defaultdict
+from itertools import chain, repeat
+from dataclasses import dataclass, field, fields, replace
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    ClassVar, Dict, Any, FrozenSet, List, Optional, Set, Tuple,
+)
+
+import pandas as pd
 import intake_esgf
 from intake_esgf import ESGFCatalog
 
+from descargar_faltantes import walk_nc
+
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ConfiguracionBusqueda:
-    """Parámetros de configuración para la búsqueda en ESGF."""
+    """Parámetros de configuración para la búsqueda en ESGF (inmutable)."""
     experiment_id: str = "dcppA-hindcast"
     table_id: str = "Amon"
     variable_id: str = "pr"
     source_id: Optional[str] = None
     grid_label: str = "gn"
     latest: bool = True
+    max_workers: Optional[int] = None
+    usar_aria2: bool = False
+    verificar_hashes: bool = False
+    _cache_a_dict: Optional[Dict[str, Any]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    # Campos que controlan la ejecución local y no se envían a ESGF
+    _CAMPOS_EJECUCION: ClassVar[FrozenSet[str]] = frozenset(
+        {"max_workers", "usar_aria2", "verificar_hashes"}
+    )
 
     def __post_init__(self) -> None:
         """Valida que los campos obligatorios no estén vacíos."""
@@ -44,15 +72,26 @@ class ConfiguracionBusqueda:
                 raise ValueError("'source_id' no puede estar vacío.")
             if not self.variable_id or not self.variable_id.strip():
                 raise ValueError("'variable_id' no puede estar vacío.")
+            if self.max_workers is not None and self.max_workers < 1:
+                raise ValueError("'max_workers' debe ser mayor o igual a 1.")
         except ValueError as e:
             raise ValueError(f"[VALIDACIÓN] Configuración inválida: {e}") from e
 
     def a_dict(self) -> Dict[str, Any]:
         """Convierte la configuración a un diccionario para intake-esgf.
         
-        Filtra los campos con valor None para evitar enviar parámetros vacíos.
+        Filtra los campos con valor None para evitar enviar parámetros vacíos
+        y los campos de ejecución local (ej: max_workers, usar_aria2).
+        Como la instancia es inmutable, el resultado se calcula una sola vez.
         """
-        return {k: v for k, v in asdict(self).items() if v is not None}
+        if self._cache_a_dict is None:
+            object.__setattr__(self, "_cache_a_dict", {
+                f.name: getattr(self, f.name) for f in fields(self)
+                if f.init
+                and f.name not in self._CAMPOS_EJECUCION
+                and getattr(self, f.name) is not None
+            })
+        return dict(self._cache_a_dict)
 
 
 class DescargadorDatosESGF:
@@ -60,12 +99,37 @@ class DescargadorDatosESGF:
 
     # Patrón para carpetas con formato sYYYY-rXXiXpXfX en la ruta del caché
     _PATRON_MEMBER: re.Pattern = re.compile(r"^(s\d{4})-(r.+)$")
+    # Niveles desde el final de la ruta del directorio hasta la carpeta
+    # member_id en la DRS de CMIP6 (member/table/variable/grid/version)
+    _NIVEL_MEMBER_DRS: int = 5
+    # Modelo = 3.ª parte del nombre: variable_table_model_experiment_...
+    _PATRON_MODELO: re.Pattern = re.compile(r"^[^_]+_[^_]+_([^_]+)_")
+
+    # Opciones de aria2c: conexiones por archivo/servidor, descargas
+    # simultáneas y reanudación de descargas parciales
+    _OPCIONES_ARIA2: Tuple[str, ...] = (
+        "-x", "8", "-s", "8", "-j", "16", "--continue=true",
+    )
+    # Sufijo de los archivos a medio descargar por aria2c
+    _SUFIJO_PARCIAL: str = ".part"
+    # Tipos de checksum de ESGF y su nombre en la opción checksum= de aria2c
+    _CHECKSUMS_ARIA2: Dict[str, str] = {
+        "sha256": "sha-256", "sha512": "sha-512", "sha1": "sha-1", "md5": "md5",
+    }
+    # Tamaño del buffer de escritura del CSV de fallos (1 MiB)
+    _BUFFER_CSV: int = 1 << 20
+    # Hilos para verificar checksums (lectura de disco + hash)
+    _HILOS_HASH: int = min(8, os.cpu_count() or 1)
+    # Hilos para mover archivos (operaciones de E/S, no de CPU)
+    _HILOS_MOVIMIENTO: int = min(32, (os.cpu_count() or 1) * 4)
 
     def __init__(
         self,
         directorio_cache: str = "datos_cmip6_norcpm1",
         directorio_salida: str = "datos",
-        configuracion: Optional[ConfiguracionBusqueda] = None
+        configuracion: Optional[ConfiguracionBusqueda] = None,
+        directorio_busquedas: str = "_cache_busquedas_esgf",
+        ttl_busquedas: float = 86400.0,
     ) -> None:
         """
         Inicializa el descargador con la configuración necesaria.
@@ -77,13 +141,24 @@ class DescargadorDatosESGF:
                                con estructura organizada:
                                Modelo/variante/sub_experiment/archivo.nc
             configuracion: Instancia de ConfiguracionBusqueda con los parámetros.
+            directorio_busquedas: Directorio donde se guardan los resultados
+                                  de búsqueda para reutilizarlos entre
+                                  ejecuciones (no se elimina al terminar).
+            ttl_busquedas: Vigencia en segundos de una búsqueda guardada.
+                           Un valor <= 0 desactiva la caché de búsquedas.
         """
-        self._directorio_cache: str = os.path.abspath(directorio_cache)
+        self._directorio_cache_path: Path = Path(os.path.abspath(directorio_cache))
+        self._directorio_cache: str = str(self._directorio_cache_path)
         self._directorio_salida: Path = Path(os.path.abspath(directorio_salida))
+        self._directorio_busquedas: Path = Path(os.path.abspath(directorio_busquedas))
+        self._ttl_busquedas: float = ttl_busquedas
         self._catalogo: Optional[ESGFCatalog] = None
         self._configuracion: ConfiguracionBusqueda = configuracion or ConfiguracionBusqueda()
-        self._resultado_descarga: Dict[str, Any] = {}
+        self._resultado_descarga: Dict[str, List[Any]] = {}
+        self._info_archivos: Optional[List[Dict[str, Any]]] = None
         self._claves_fallidas: Set[str] = set()
+        self._claves_hash_invalido: Set[str] = set()
+        self._cache_metadatos_directorio: Dict[Path, Optional[Tuple[str, str]]] = {}
         self._logger: logging.Logger = self._configurar_logger()
 
     # ------------------------------------------------------------------ #
@@ -127,7 +202,13 @@ class DescargadorDatosESGF:
     # ------------------------------------------------------------------ #
 
     def _configurar_logger(self) -> logging.Logger:
-        """Inicializa y retorna un logger con formato en español."""
+        """
+        Inicializa y retorna un logger con formato en español.
+
+        Los mensajes se encolan y un hilo en segundo plano
+        (QueueListener) los escribe, para que la E/S del log no bloquee
+        los bucles de descarga y reorganización.
+        """
         try:
             logger = logging.getLogger(
                 f"DescargadorESGF.{self._configuracion.source_id}"
@@ -139,7 +220,12 @@ class DescargadorDatosESGF:
                     datefmt="%Y-%m-%d %H:%M:%S",
                 )
                 handler.setFormatter(formato)
-                logger.addHandler(handler)
+
+                cola: queue.Queue = queue.Queue(-1)
+                listener = logging.handlers.QueueListener(cola, handler)
+                listener.start()
+                atexit.register(listener.stop)
+                logger.addHandler(logging.handlers.QueueHandler(cola))
             logger.setLevel(logging.INFO)
             return logger
         except Exception as e:
@@ -187,9 +273,8 @@ class DescargadorDatosESGF:
         hace fallback automático a grid_label='gr'.
         """
         try:
-            self._catalogo.search(**self._configuracion.a_dict())
-            self._logger.info("Búsqueda completada. Resultados encontrados:")
-            self._logger.info("\n%s", self._catalogo.df)
+            self._buscar()
+            self._registrar_resultados_busqueda("Búsqueda completada.")
 
             # Fallback: si no hay resultados con 'gn', reintentar con 'gr'
             if len(self._catalogo.df) == 0 and self._configuracion.grid_label == "gn":
@@ -197,19 +282,98 @@ class DescargadorDatosESGF:
                     "No se encontraron resultados con grid_label='gn'. "
                     "Reintentando con grid_label='gr'..."
                 )
-                self._configuracion.grid_label = "gr"
+                self._configuracion = replace(
+                    self._configuracion, grid_label="gr"
+                )
                 self._catalogo = ESGFCatalog()
-                self._catalogo.search(**self._configuracion.a_dict())
-                self._logger.info(
-                    "Búsqueda con fallback 'gr' completada. Resultados:"
+                self._buscar()
+                self._registrar_resultados_busqueda(
+                    "Búsqueda con fallback 'gr' completada."
                 )
-                self._logger.info("\n%s", self._catalogo.df)
         except Exception as e:
             self._logger.error(
                 "Fallo durante la búsqueda en el catálogo ESGF: %r", e
             )
             raise
 
+    def _registrar_resultados_busqueda(self, mensaje: str) -> None:
+        """
+        Registra el número de resultados de la búsqueda.
+
+        La tabla completa solo se formatea si el nivel DEBUG está activo,
+        ya que convertir el DataFrame a texto recorre todas sus filas.
+        """
+        self._logger.info(
+            "%s Resultados encontrados: %d", mensaje, len(self._catalogo.df)
+        )
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug("\n%s", self._catalogo.df.to_string())
+
+    def _buscar(self) -> None:
+        """Busca en ESGF salvo que exista una búsqueda guardada vigente."""
+        if self._cargar_cache_busqueda():
+            return
+        self._catalogo.search(**self._configuracion.a_dict())
+        self._guardar_cache_busqueda()
+
+    def _ruta_cache_busqueda(self) -> Path:
+        """Ruta del archivo de caché asociado a los parámetros de búsqueda."""
+        parametros = json.dumps(self._configuracion.a_dict(), sort_keys=True)
+        resumen = hashlib.blake2b(parametros.encode("utf-8")).hexdigest()[:16]
+        return self._directorio_busquedas / f"search_{resumen}.pkl"
+
+    def _cargar_cache_busqueda(self) -> bool:
+        """
+        Carga en el catálogo una búsqueda guardada si no ha expirado.
+
+        Returns:
+            True si se cargó la búsqueda desde la caché, False en caso contrario.
+        """
+        if self._ttl_busquedas <= 0:
+            return False
+        ruta = self._ruta_cache_busqueda()
+        try:
+            if time.time() - ruta.stat().st_mtime >= self._ttl_busquedas:
+                return False
+            with ruta.open("rb") as f:
+                guardado = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            self._logger.warning(
+                "No se pudo leer la caché de búsqueda '%s': %s", ruta, e
+            )
+            return False
+
+        self._catalogo.df = guardado["df"]
+        self._catalogo.last_search = guardado["last_search"]
+        self._catalogo._set_project()
+        self._logger.info("Búsqueda cargada desde caché: %s", ruta)
+        return True
+
+    def _guardar_cache_busqueda(self) -> None:
+        """Guarda el resultado de la búsqueda (si no está vacío) en disco."""
+        if self._ttl_busquedas <= 0 or len(self._catalogo.df) == 0:
+            return
+        ruta = self._ruta_cache_busqueda()
+        try:
+            self._directorio_busquedas.mkdir(parents=True, exist_ok=True)
+            ruta_temporal = ruta.with_suffix(".tmp")
+            with ruta_temporal.open("wb") as f:
+                pickle.dump(
+                    {
+                        "df": self._catalogo.df,
+                        "last_search": self._catalogo.last_search,
+                    },
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(ruta_temporal, ruta)
+        except OSError as e:
+            self._logger.warning(
+                "No se pudo guardar la caché de búsqueda '%s': %s", ruta, e
+            )
+
     def _validar_resultados(self) -> bool:
         """
         Verifica que la búsqueda haya devuelto resultados.
@@ -242,36 +406,244 @@ class DescargadorDatosESGF:
     def _descargar_datasets(self) -> None:
         """
         Orquesta la descarga de datasets: ejecución tolerante,
-        detección de fallos, resumen y registro.
+        detección de fallos, verificación opcional de checksums,
+        resumen y registro.
         """
         self._ejecutar_descarga_tolerante()
         self._detectar_fallos()
+        if self._configuracion.verificar_hashes:
+            self._verificar_hashes()
         self._imprimir_resumen_descarga()
 
         if self._claves_fallidas:
             self._registrar_fallos_csv()
 
     def _ejecutar_descarga_tolerante(self) -> None:
-        """Descarga los datasets sin interrumpirse por errores parciales."""
+        """
+        Descarga los datasets sin interrumpirse por errores parciales.
+
+        Una sola llamada a ``to_path_dict``: intake_esgf ya reparte la
+        descarga de archivos en un pool de ``num_threads`` hilos. Solo se
+        ajusta si se indicó ``max_workers``; si no, se respeta el valor por
+        defecto de intake_esgf. Las claves que no se pueden descargar
+        quedan fuera de ``_resultado_descarga`` y se detectan luego en
+        ``_detectar_fallos``.
+        """
         try:
-            intake_esgf.conf.set(break_on_error=False)
-            self._resultado_descarga = self._catalogo.to_dataset_dict()
+            opciones: Dict[str, Any] = {"break_on_error": False}
+            if self._configuracion.max_workers is not None:
+                opciones["num_threads"] = self._configuracion.max_workers
+            intake_esgf.conf.set(**opciones)
+            if self._configuracion.usar_aria2:
+                self._descargar_con_aria2(
+                    self._obtener_info_archivos(), self._directorio_cache_path
+                )
+            self._resultado_descarga = self._descargar_rutas()
         except Exception as e:
             self._logger.error("Ocurrió un fallo durante la descarga: %s", e)
             raise
 
+    def _obtener_info_archivos(self) -> List[Dict[str, Any]]:
+        """
+        Obtiene (una sola vez) la información por archivo del catálogo:
+        ruta DRS relativa, URLs HTTP, tamaño y checksum.
+        """
+        if self._info_archivos is None:
+            self._info_archivos = self._catalogo._get_file_info(quiet=True)
+        return self._info_archivos
+
+    def _descargar_con_aria2(
+        self, archivos: List[Dict[str, Any]], destino: Path
+    ) -> None:
+        """
+        Descarga previa de los archivos con aria2c (varias conexiones por
+        archivo y reanudación de descargas parciales).
+
+        Cada archivo se descarga como ``<ruta DRS>.part`` dentro de
+        ``destino`` y solo se renombra a su nombre final cuando aria2c lo
+        completa y verifica su checksum de ESGF. intake_esgf confía en
+        cualquier archivo presente en su caché, así que los archivos sin un
+        checksum que aria2c sepa verificar se dejan a intake_esgf, que los
+        descarga y verifica por su cuenta. intake_esgf reutiliza los archivos ya presentes en su
+        caché, por lo que ``to_path_dict`` solo descargará los que
+        aria2c no haya conseguido.
+
+        Args:
+            archivos: Información por archivo devuelta por intake_esgf.
+            destino: Directorio de caché local de intake_esgf.
+        """
+        if shutil.which("aria2c") is None:
+            self._logger.warning(
+                "aria2c no está disponible en el PATH; se usará el "
+                "descargador de intake_esgf."
+            )
+            return
+
+        pendientes = [
+            info for info in archivos
+            if info.get("HTTPServer")
+            and self._checksum_aria2(info) is not None
+            and not (destino / info["path"]).exists()
+        ]
+        if not pendientes:
+            return
+
+        self._logger.info(
+            "Descargando %d archivos con aria2c...", len(pendientes)
+        )
+        with tempfile.TemporaryDirectory() as directorio_temporal:
+            ruta_entrada = os.path.join(directorio_temporal, "entrada_aria2.txt")
+            ruta_sesion = os.path.join(directorio_temporal, "sesion_aria2.txt")
+            with open(ruta_entrada, mode="w", encoding="utf-8") as entrada:
+                for info in pendientes:
+                    entrada.write("\t".join(info["HTTPServer"]) + "\n")
+                    entrada.write(
+                        f"  out={info['path']}{self._SUFIJO_PARCIAL}\n"
+                        f"  checksum={self._checksum_aria2(info)}\n"
+                    )
+            try:
+                resultado = subprocess.run(
+                    ["aria2c", "-i", ruta_entrada, *self._OPCIONES_ARIA2,
+                     f"--dir={destino}", f"--save-session={ruta_sesion}"],
+                    check=False,
+                )
+            except OSError as e:
+                self._logger.warning("Fallo al ejecutar aria2c: %s", e)
+                return
+
+            # La sesión lista las descargas con error (incluido un checksum
+            # que no coincide) o sin terminar; ninguna entra en la caché.
+            no_completados = set()
+            if os.path.exists(ruta_sesion):
+                with open(ruta_sesion, encoding="utf-8") as sesion:
+                    no_completados = {
+                        linea.strip()[len("out="):] for linea in sesion
+                        if linea.strip().startswith("out=")
+                    }
+
+        if resultado.returncode != 0:
+            self._logger.warning(
+                "aria2c terminó con código %d; los archivos restantes "
+                "se descargarán con intake_esgf.", resultado.returncode,
+            )
+
+        completos = 0
+        for info in pendientes:
+            parcial = destino / f"{info['path']}{self._SUFIJO_PARCIAL}"
+            control = parcial.with_name(parcial.name + ".aria2")
+            if f"{info['path']}{self._SUFIJO_PARCIAL}" in no_completados:
+                # Completo pero rechazado por checksum: no se puede reanudar
+                if parcial.exists() and not control.exists():
+                    parcial.unlink(missing_ok=True)
+                continue
+            if parcial.exists() and not control.exists():
+                os.replace(parcial, destino / info["path"])
+                completos += 1
+        self._logger.info(
+            "aria2c completó %d de %d archivos.", completos, len(pendientes)
+        )
+
+    def _checksum_aria2(self, info: Dict[str, Any]) -> Optional[str]:
+        """Devuelve el valor ``<tipo>=<hex>`` de la opción checksum de aria2c."""
+        tipo = self._CHECKSUMS_ARIA2.get(
+            str(info.get("checksum_type") or "").lower().replace("-", "")
+        )
+        if tipo is None or not info.get("checksum"):
+            return None
+        return f"{tipo}={str(info['checksum']).lower()}"
+
+    def _descargar_rutas(self) -> Dict[str, Any]:
+        """
+        Descarga los archivos del catálogo conservando las claves completas.
+
+        Usa ``to_path_dict`` en lugar de ``to_dataset_dict``: solo se
+        necesitan los archivos en disco, no abrirlos con xarray. Con
+        ``minimal_keys=False`` las claves coinciden con la columna ``key``
+        del catálogo, que es la que usa ``_detectar_fallos``.
+
+        Returns:
+            Diccionario {clave: lista de rutas locales}.
+        """
+        return self._catalogo.to_path_dict(minimal_keys=False, quiet=True)
+
     def _detectar_fallos(self) -> None:
         """Compara claves del catálogo con las descargadas para identificar fallos."""
         try:
-            claves_catalogo: Set[str] = set(self._catalogo.df["key"])
-            claves_descargadas: Set[str] = set(self._resultado_descarga.keys())
-            self._claves_fallidas = claves_catalogo - claves_descargadas
+            claves_catalogo = pd.Index(self._catalogo.df["key"])
+            self._claves_fallidas = set(
+                claves_catalogo.difference(self._resultado_descarga.keys())
+            )
         except Exception as e:
             self._logger.error(
                 "Fallo al detectar datasets fallidos: %s", e
             )
             raise
 
+    def _verificar_hashes(self) -> None:
+        """
+        Verifica en paralelo los checksums publicados por ESGF de los
+        archivos descargados en la caché.
+
+        Los datasets con algún archivo corrupto se marcan como fallidos y
+        sus archivos corruptos se eliminan para que no se reorganicen.
+        """
+        try:
+            a_verificar: List[Tuple[Dict[str, Any], Path]] = []
+            for info in self._obtener_info_archivos():
+                if not info.get("checksum") or not info.get("checksum_type"):
+                    continue
+                if info["key"] not in self._resultado_descarga:
+                    continue
+                ruta = self._directorio_cache_path / info["path"]
+                if ruta.is_file():
+                    a_verificar.append((info, ruta))
+            if not a_verificar:
+                return
+
+            self._logger.info(
+                "Verificando checksums de %d archivos...", len(a_verificar)
+            )
+            with ThreadPoolExecutor(max_workers=self._HILOS_HASH) as executor:
+                resultados = executor.map(
+                    self._checksum_coincide,
+                    (ruta for _, ruta in a_verificar),
+                    (info["checksum_type"] for info, _ in a_verificar),
+                    (info["checksum"] for info, _ in a_verificar),
+                )
+                for (info, ruta), coincide in zip(a_verificar, resultados):
+                    if coincide:
+                        continue
+                    self._logger.warning("Checksum inválido, se elimina: %s", ruta)
+                    ruta.unlink(missing_ok=True)
+                    self._claves_hash_invalido.add(info["key"])
+
+            for clave in self._claves_hash_invalido:
+                self._resultado_descarga.pop(clave, None)
+            self._claves_fallidas |= self._claves_hash_invalido
+        except Exception as e:
+            self._logger.error("Fallo al verificar los checksums: %s", e)
+            raise
+
+    def _checksum_coincide(
+        self, ruta: Path, algoritmo: str, esperado: str
+    ) -> bool:
+        """
+        Calcula el checksum del archivo por bloques y lo compara.
+
+        Un algoritmo no soportado o un archivo ilegible se registra y se
+        da por no verificable (se considera válido) en lugar de abortar
+        la verificación del resto de archivos.
+        """
+        try:
+            with open(ruta, "rb") as f:
+                calculado = hashlib.file_digest(f, algoritmo.lower()).hexdigest()
+        except (OSError, ValueError) as e:
+            self._logger.warning(
+                "No se pudo verificar el checksum de %s: %s", ruta, e
+            )
+            return True
+        return calculado == esperado.lower()
+
     def _imprimir_resumen_descarga(self) -> None:
         """Registra un resumen con el conteo de éxitos y fallos."""
         try:
@@ -321,20 +693,27 @@ class DescargadorDatosESGF:
             archivo_existe = os.path.isfile(ruta_csv)
             fecha_intento = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-            with open(ruta_csv, mode="a", newline="", encoding="utf-8") as f:
+            with open(
+                ruta_csv, mode="a", newline="", encoding="utf-8",
+                buffering=self._BUFFER_CSV,
+            ) as f:
                 escritor = csv.writer(f)
                 if not archivo_existe:
                     escritor.writerow([
                         "clave_dataset", "source_id",
                         "fecha_intento", "motivo",
                     ])
-                for clave in self._claves_fallidas:
-                    escritor.writerow([
+                escritor.writerows(
+                    (
                         clave,
                         self._configuracion.source_id,
                         fecha_intento,
-                        "Nodo offline o sin información de acceso",
-                    ])
+                        "Checksum no coincide"
+                        if clave in self._claves_hash_invalido
+                        else "Nodo offline o sin información de acceso",
+                    )
+                    for clave in sorted(self._claves_fallidas)
+                )
             self._logger.info("Fallos registrados en: %s", ruta_csv)
         except OSError as e:
             self._logger.error(
@@ -371,8 +750,7 @@ class DescargadorDatosESGF:
     def _buscar_archivos_nc(self) -> List[Path]:
         """Busca todos los archivos .nc en el directorio de caché temporal."""
         try:
-            ruta_cache = Path(self._directorio_cache)
-            return list(ruta_cache.rglob("*.nc"))
+            return [Path(entrada.path) for entrada in walk_nc(self._directorio_cache)]
         except Exception as e:
             self._logger.error(
                 "Fallo al buscar archivos .nc en la caché: %s", e
@@ -398,32 +776,24 @@ class DescargadorDatosESGF:
         """
         try:
             # --- Extraer modelo del nombre del archivo ---
-            partes_nombre = ruta_archivo.name.split('_')
-            if len(partes_nombre) < 3:
+            match_modelo = self._PATRON_MODELO.match(ruta_archivo.name)
+            if match_modelo is None:
                 self._logger.warning(
                     "Formato de nombre no reconocido: %s", ruta_archivo.name
                 )
                 return None
-            modelo = partes_nombre[2]
+            modelo = match_modelo.group(1)
 
             # --- Extraer variante y sub_experiment de la ruta ---
-            sub_experiment: Optional[str] = None
-            variante: Optional[str] = None
-
-            for parte in reversed(ruta_archivo.parts):
-                match = self._PATRON_MEMBER.match(parte)
-                if match:
-                    sub_experiment = match.group(1)  # ej: s1960
-                    variante = match.group(2)        # ej: r10i1p1f1
-                    break
-
-            if not sub_experiment or not variante:
+            metadatos_directorio = self._metadatos_directorio(ruta_archivo.parent)
+            if metadatos_directorio is None:
                 self._logger.warning(
                     "No se pudo extraer variante/sub_experiment de: %s",
                     ruta_archivo,
                 )
                 return None
 
+            variante, sub_experiment = metadatos_directorio
             return (modelo, variante, sub_experiment)
 
         except Exception as e:
@@ -432,53 +802,178 @@ class DescargadorDatosESGF:
             )
             return None
 
-    def _mover_archivos(self, archivos: List[Path]) -> Tuple[int, int]:
+    def _metadatos_directorio(self, directorio: Path) -> Optional[Tuple[str, str]]:
         """
-        Mueve los archivos .nc a la estructura organizada.
+        Obtiene (variante, sub_experiment) de la carpeta sYYYY-rXXiXpXfX
+        más cercana a ``directorio``.
+
+        Todos los archivos de un mismo directorio comparten el resultado,
+        que se memoriza por directorio.
+
+        Args:
+            directorio: Directorio padre de un archivo .nc.
+
+        Returns:
+            Tupla (variante, sub_experiment) o None si ninguna carpeta de
+            la ruta cumple el patrón.
+        """
+        if directorio in self._cache_metadatos_directorio:
+            return self._cache_metadatos_directorio[directorio]
+
+        partes = directorio.parts
+        # Candidatos directos: la propia carpeta y la posición del member_id
+        # en la DRS de CMIP6 (member/table/variable/grid/version/archivo.nc).
+        # Solo si ambos fallan se recorre la ruta completa.
+        nivel = self._NIVEL_MEMBER_DRS
+        candidatos = partes[-1:] + partes[-nivel:-nivel + 1]
+
+        resultado: Optional[Tuple[str, str]] = None
+        for parte in chain(candidatos, reversed(partes)):
+            match = self._PATRON_MEMBER.match(parte)
+            if match:
+                resultado = (match.group(2), match.group(1))  # ej: (r10i1p1f1, s1960)
+                break
+
+        self._cache_metadatos_directorio[directorio] = resultado
+        return resultado
+
+    def _agrupar_por_destino(
+        self, archivos: List[Path]
+    ) -> Tuple[Dict[Tuple[str, str, str], List[Path]], int]:
+        """
+        Agrupa los archivos .nc por (modelo, variante, sub_experiment).
 
         Args:
             archivos: Lista de rutas a archivos .nc.
 
         Returns:
-            Tupla (archivos_movidos, errores).
+            Tupla (grupos, errores) donde errores es el número de archivos
+            cuyos metadatos no se pudieron extraer.
         """
-        movidos: int = 0
+        grupos: Dict[Tuple[str, str, str], List[Path]] = defaultdict(list)
         errores: int = 0
 
         for archivo in archivos:
-            try:
-                metadatos = self._extraer_metadatos_ruta(archivo)
-                if metadatos is None:
-                    errores += 1
-                    continue
+            metadatos = self._extraer_metadatos_ruta(archivo)
+            if metadatos is None:
+                errores += 1
+                continue
+            grupos[metadatos].append(archivo)
 
-                modelo, variante, sub_experiment = metadatos
+        return (grupos, errores)
 
-                # Estructura: salida / Modelo / variante / sub_experiment /
-                directorio_destino = (
-                    self._directorio_salida / modelo / variante / sub_experiment
-                )
-                ruta_destino = directorio_destino / archivo.name
+    def _mover_archivos(self, archivos: List[Path]) -> Tuple[int, int]:
+        """
+        Mueve los archivos .nc a la estructura organizada.
+
+        El directorio destino se crea y se lista una sola vez por grupo
+        (modelo, variante, sub_experiment), de modo que los archivos ya
+        presentes se omiten sin un stat por archivo. También se decide por
+        grupo si el destino está en el mismo dispositivo que la caché
+        (renombrado) o no (copia). Los renombrados se reparten en un pool
+        de hilos, ya que cada uno es una llamada al sistema que libera el
+        GIL; las copias entre dispositivos se hacen de una en una para no
+        saturar el disco con varias copias de NetCDF grandes a la vez.
 
+        Args:
+            archivos: Lista de rutas a archivos .nc.
+
+        Returns:
+            Tupla (archivos_movidos, errores).
+        """
+        grupos, errores = self._agrupar_por_destino(archivos)
+        origenes: List[Path] = []
+        destinos: List[str] = []
+        copias: List[Tuple[Path, str]] = []
+        dispositivo_cache = os.stat(self._directorio_cache).st_dev
+
+        for (modelo, variante, sub_experiment), archivos_grupo in grupos.items():
+            # Estructura: salida / Modelo / variante / sub_experiment /
+            directorio_destino = (
+                self._directorio_salida / modelo / variante / sub_experiment
+            )
+            destino = str(directorio_destino)
+            try:
                 directorio_destino.mkdir(parents=True, exist_ok=True)
+                with os.scandir(destino) as entradas:
+                    existentes: Set[str] = {entrada.name for entrada in entradas}
+                renombrable = os.stat(destino).st_dev == dispositivo_cache
+            except OSError as e:
+                self._logger.error(
+                    "No se pudo preparar el directorio '%s': %s",
+                    directorio_destino, e,
+                )
+                errores += len(archivos_grupo)
+                continue
 
-                if ruta_destino.exists():
+            for archivo in archivos_grupo:
+                if archivo.name in existentes:
                     self._logger.debug(
-                        "Archivo ya existe, omitiendo: %s", ruta_destino
+                        "Archivo ya existe, omitiendo: %s",
+                        os.path.join(destino, archivo.name),
                     )
                     errores += 1
                     continue
+                existentes.add(archivo.name)
+                ruta_destino = os.path.join(destino, archivo.name)
+                if renombrable:
+                    origenes.append(archivo)
+                    destinos.append(ruta_destino)
+                else:
+                    copias.append((archivo, ruta_destino))
+
+        movidos = 0
+        if origenes:
+            with ThreadPoolExecutor(max_workers=self._HILOS_MOVIMIENTO) as executor:
+                movidos += sum(executor.map(
+                    self._intentar_mover, origenes, destinos, repeat(True)
+                ))
+        movidos += sum(
+            self._intentar_mover(archivo, ruta_destino, False)
+            for archivo, ruta_destino in copias
+        )
 
-                shutil.move(str(archivo), str(ruta_destino))
-                movidos += 1
+        errores += len(origenes) + len(copias) - movidos
+        return (movidos, errores)
 
-            except Exception as e:
-                self._logger.error(
-                    "Error moviendo '%s': %s", archivo, e
-                )
-                errores += 1
+    def _intentar_mover(
+        self, archivo: Path, ruta_destino: str, mismo_dispositivo: bool
+    ) -> bool:
+        """
+        Mueve un archivo a un destino que se sabe inexistente.
 
-        return (movidos, errores)
+        Returns:
+            True si se movió, False si falló.
+        """
+        try:
+            self._mover_archivo(archivo, ruta_destino, mismo_dispositivo)
+            return True
+
+        except Exception as e:
+            self._logger.error(
+                "Error moviendo '%s': %s", archivo, e
+            )
+            return False
+
+    @staticmethod
+    def _mover_archivo(
+        origen: Path, ruta_destino: str, mismo_dispositivo: bool
+    ) -> None:
+        """
+        Mueve un archivo eligiendo la vía más barata.
+
+        En el mismo sistema de archivos basta con renombrar (solo se
+        actualiza el inodo). Entre dispositivos distintos un renombrado
+        siempre falla, así que se copia y borra directamente con
+        shutil.move.
+        """
+        if mismo_dispositivo:
+            try:
+                os.rename(origen, ruta_destino)
+                return
+            except OSError:
+                pass
+        shutil.move(str(origen), ruta_destino)
 
     def _imprimir_resumen_reorganizacion(
         self, movidos: int, errores: int, total: int
@@ -504,9 +999,8 @@ class DescargadorDatosESGF:
         una vez reorganizados los archivos.
         """
         try:
-            ruta_cache = Path(self._directorio_cache)
-            if ruta_cache.exists():
-                shutil.rmtree(self._directorio_cache)
+            if self._directorio_cache_path.exists():
+                shutil.rmtree(self._directorio_cache_path)
                 self._logger.info(
                     "Caché temporal eliminada: %s", self._directorio_cache
                 )
@@ -537,16 +1031,46 @@ if __name__ == "__main__":
         default="datos",
         help="Directorio de salida con estructura organizada (default: datos)",
     )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=None,
+        help="Número de archivos descargados en paralelo "
+             "(default: el de intake_esgf)",
+    )
+    parser.add_argument(
+        "--usar_aria2",
+        action="store_true",
+        help="Descargar los archivos con aria2c (multiconexión y reanudable)",
+    )
+    parser.add_argument(
+        "--verificar_hashes",
+        action="store_true",
+        help="Verificar los checksums de ESGF tras la descarga",
+    )
+    parser.add_argument(
+        "--ttl_busquedas",
+        type=float,
+        default=86400.0,
+        help="Vigencia en segundos de las búsquedas guardadas; 0 la desactiva "
+             "(default: 86400)",
+    )
     args = parser.parse_args()
 
     try:
-        config = ConfiguracionBusqueda(source_id=args.source_id)
+        config = ConfiguracionBusqueda(
+            source_id=args.source_id,
+            max_workers=args.max_workers,
+            usar_aria2=args.usar_aria2,
+            verificar_hashes=args.verificar_hashes,
+        )
         directorio_cache = f"_cache_esgf_{args.source_id.lower()}"
 
         descargador = DescargadorDatosESGF(
             directorio_cache=directorio_cache,
             directorio_salida=args.directorio_salida,
             configuracion=config,
+            ttl_busquedas=args.ttl_busquedas,
         )
         descargador.ejecutar()
     except Exception as error_fatal:
@@ -13,23 +13,47 @@ y reorganiza los `.nc` a la estructura:
 from __future__ import annotations
 
 import argparse
+import asyncio
 import csv
+import errno
 import logging
+import os
 import re
 import shutil
-from dataclasses import dataclass
+import sys
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator, NamedTuple
 
-import intake_esgf
-from intake_esgf import ESGFCatalog
 
+# variable_table_modelo_experiment_sYYYY-ensamble_...: el nombre ya lleva el member
+# Grupos por posicion: 1=modelo, 2=sYYYY, 3=ensamble
+PATRON_NOMBRE_ARCHIVO = re.compile(r"^[^_]+_[^_]+_([^_]+)_[^_]+_(s\d{4})-(r[^_]+)_")
 
-PATRON_MEMBER_CARPETA = re.compile(r"^(s\d{4})-(r.+)$")
+# Anio de inicializacion de un member_id (s1960-r1i1p1f1), suelto o dentro de una clave con puntos
+PATRON_ANIO_MEMBER = re.compile(r"(?:^|\.)s(\d{4})-")
 
+# Buffer de escritura de los CSV de salida (1 MiB)
+BUFFER_CSV = 1 << 20
 
-@dataclass(frozen=True)
-class TareaDescarga:
+# Columnas del reporte; cada resultado es una tupla en este orden
+CAMPOS_REPORTE = ("modelo", "ensamble", "anio", "estado", "detalle")
+
+# Resultado de una tarea: (modelo, ensamble, anio, estado, detalle)
+Resultado = tuple[str, str, int | str, str, str]
+
+# Hilos para mover .nc dentro del mismo volumen (cada movimiento es un rename)
+HILOS_MOVIMIENTO = 8
+
+# ESGFCatalog() comprueba la cache (crea y borra tmp.txt) y puede crear la base
+# de descargas al construirse: no es seguro hacerlo desde varios hilos a la vez
+LOCK_CATALOGO = threading.Lock()
+
+
+class TareaDescarga(NamedTuple):
     modelo: str
     ensamble: str
     anio: int
@@ -65,85 +89,274 @@ def leer_tareas_desde_csv(ruta_csv: Path, filtro_modelo: str | None) -> list[Tar
     filtro = filtro_modelo.lower() if filtro_modelo else None
 
     with ruta_csv.open("r", encoding="utf-8", newline="") as archivo:
-        reader = csv.DictReader(archivo)
-        columnas = set(reader.fieldnames or [])
-        requeridas = {"modelo", "ensamble", "lista_anios_faltantes"}
-        faltantes = requeridas - columnas
+        reader = csv.reader(archivo)
+        cabecera = next(reader, [])
+        requeridas = ("modelo", "ensamble", "lista_anios_faltantes")
+        faltantes = set(requeridas) - set(cabecera)
         if faltantes:
             raise ValueError(
                 f"CSV invalido. Faltan columnas requeridas: {sorted(faltantes)}"
             )
+        idx_modelo, idx_ensamble, idx_anios = (cabecera.index(c) for c in requeridas)
+        n_minimo = max(idx_modelo, idx_ensamble, idx_anios) + 1
 
         for fila in reader:
-            modelo = (fila.get("modelo") or "").strip()
-            ensamble = (fila.get("ensamble") or "").strip()
+            # Filas cortas no tienen todas las columnas: no generan tareas
+            if len(fila) < n_minimo:
+                continue
+            modelo = sys.intern(fila[idx_modelo].strip())
+            ensamble = sys.intern(fila[idx_ensamble].strip())
             if not modelo or not ensamble:
                 continue
             if filtro and filtro not in modelo.lower():
                 continue
 
-            for anio in parsear_lista_anios((fila.get("lista_anios_faltantes") or "").strip()):
+            for anio in parsear_lista_anios(fila[idx_anios].strip()):
                 tareas.append(TareaDescarga(modelo=modelo, ensamble=ensamble, anio=anio))
 
     return tareas
 
 
-def ya_existe_en_salida(tarea: TareaDescarga, directorio_salida: Path) -> bool:
-    destino = directorio_salida / tarea.modelo / tarea.ensamble / tarea.sub_experiment_id
-    if not destino.exists():
+def walk_nc(raiz: str) -> Iterator[os.DirEntry[str]]:
+    """Recorre `raiz` con os.scandir (sin seguir enlaces) y produce los .nc.
+
+    Las carpetas inexistentes o sin permisos se saltan, igual que hacia rglob.
+    """
+    pendientes = [raiz]
+    while pendientes:
+        try:
+            entradas = os.scandir(pendientes.pop())
+        except OSError:
+            continue
+        with entradas:
+            for entrada in entradas:
+                if entrada.is_dir(follow_symlinks=False):
+                    pendientes.append(entrada.path)
+                elif entrada.name.endswith(".nc") and entrada.is_file(follow_symlinks=False):
+                    yield entrada
+
+
+def _subcarpetas(ruta: str) -> list[os.DirEntry[str]]:
+    """Subcarpetas directas de `ruta` (lista vacia si no se puede leer)."""
+    try:
+        with os.scandir(ruta) as entradas:
+            return [e for e in entradas if e.is_dir(follow_symlinks=False)]
+    except OSError:
+        return []
+
+
+def _tiene_nc(carpeta: str) -> bool:
+    """True en cuanto aparece el primer .nc directo en `carpeta`."""
+    try:
+        with os.scandir(carpeta) as entradas:
+            return any(
+                e.name.endswith(".nc") and e.is_file(follow_symlinks=False)
+                for e in entradas
+            )
+    except OSError:
         return False
-    return any(destino.glob("*.nc"))
 
 
-def descargar_tarea(
-    tarea: TareaDescarga,
+def construir_indice_salida(directorio_salida: Path) -> set[tuple[str, str, str]]:
+    """Recorre la salida una vez y devuelve los (modelo, ensamble, sYYYY) con algun .nc.
+
+    Solo cuentan los .nc que estan directamente en datos/<Modelo>/<ensamble>/sYYYY/.
+    Cada carpeta sYYYY se deja de leer en cuanto aparece su primer .nc.
+    """
+    indice: set[tuple[str, str, str]] = set()
+    for modelo in _subcarpetas(str(directorio_salida)):
+        for ensamble in _subcarpetas(modelo.path):
+            for sub_exp in _subcarpetas(ensamble.path):
+                if _tiene_nc(sub_exp.path):
+                    indice.add((modelo.name, ensamble.name, sub_exp.name))
+    return indice
+
+
+def ya_existe_en_salida(tarea: TareaDescarga, indice: set[tuple[str, str, str]]) -> bool:
+    return (tarea.modelo, tarea.ensamble, tarea.sub_experiment_id) in indice
+
+
+def anio_de_member(texto: str) -> int | None:
+    """Anio de inicializacion del primer member sYYYY-... en `texto` (member_id o clave)."""
+    match = PATRON_ANIO_MEMBER.search(texto)
+    return int(match[1]) if match else None
+
+
+def descargar_grupo(
+    modelo: str,
+    ensamble: str,
+    anios: list[int],
     experiment_id: str,
     table_id: str,
     variable_id: str,
     grid_label: str,
     latest: bool,
-) -> tuple[str, str]:
-    """Descarga una tarea y devuelve (estado, detalle).
+) -> dict[int, tuple[str, str]]:
+    """Descarga todos los anios de un modelo+ensamble y devuelve {anio: (estado, detalle)}.
 
+    Se hace una unica busqueda con la lista de sub_experiment_id y el estado
+    de cada anio se reconstruye a partir del member_id de los resultados.
     Intenta primero con grid_label indicado (preferiblemente 'gn').
-    Si no hay resultados y grid_label=='gn', hace fallback automático a 'gr'.
+    Los anios sin resultados con grid_label=='gn' se reintentan juntos con 'gr'.
     """
-    def _intentar_descarga(gl: str) -> tuple[str, str]:
+    from intake_esgf import ESGFCatalog
+
+    def _intentar_descarga(gl: str, anios_gl: list[int]) -> dict[int, tuple[str, str]]:
         params: dict[str, Any] = {
             "experiment_id": experiment_id,
             "table_id": table_id,
             "variable_id": variable_id,
-            "source_id": tarea.modelo,
+            "source_id": modelo,
             "grid_label": gl,
             "latest": latest,
-            "sub_experiment_id": tarea.sub_experiment_id,
-            "variant_label": tarea.ensamble,
+            "sub_experiment_id": [f"s{anio}" for anio in anios_gl],
+            "variant_label": ensamble,
         }
-        catalogo = ESGFCatalog()
+        with LOCK_CATALOGO:
+            catalogo = ESGFCatalog()
         catalogo.search(**params)
 
+        sin_resultados = ("sin_resultados", f"No hay resultados en ESGF (grid_label={gl}).")
         if len(catalogo.df) == 0:
-            return ("sin_resultados", f"No hay resultados en ESGF (grid_label={gl}).")
+            return dict.fromkeys(anios_gl, sin_resultados)
+
+        encontrados = {anio_de_member(member) for member in catalogo.df["member_id"]}
+
+        # Claves completas (master_id) para poder leer el member de cada dataset
+        datasets = catalogo.to_dataset_dict(minimal_keys=False)
+        por_anio = Counter(anio_de_member(clave) for clave in datasets)
+
+        estados: dict[int, tuple[str, str]] = {}
+        for anio in anios_gl:
+            if anio not in encontrados:
+                estados[anio] = sin_resultados
+            elif por_anio[anio] == 0:
+                estados[anio] = (
+                    "sin_descarga",
+                    f"Busqueda OK (grid_label={gl}) pero descarga fallida.",
+                )
+            else:
+                estados[anio] = (
+                    "descargado",
+                    f"Datasets descargados: {por_anio[anio]} (grid_label={gl})",
+                )
+        return estados
+
+    try:
+        estados = _intentar_descarga(grid_label, anios)
+
+        # Fallback gn → gr, en una sola busqueda, para los anios sin resultados
+        if grid_label == "gn":
+            sin_resultados = [
+                anio for anio, (estado, _) in estados.items() if estado == "sin_resultados"
+            ]
+            if sin_resultados:
+                estados.update(_intentar_descarga("gr", sin_resultados))
+
+        return estados
+
+    except Exception as exc:
+        return dict.fromkeys(anios, ("error", f"{type(exc).__name__}: {exc}"))
 
-        intake_esgf.conf.set(break_on_error=False)
-        datasets = catalogo.to_dataset_dict()
 
-        if len(datasets) == 0:
-            return ("sin_descarga", f"Busqueda OK (grid_label={gl}) pero descarga fallida.")
+async def descargar_grupo_async(
+    modelo: str, ensamble: str, anios: list[int], **parametros: Any
+) -> dict[int, tuple[str, str]]:
+    """Ejecuta `descargar_grupo` en un hilo (intake_esgf es sincrono)."""
+    return await asyncio.to_thread(descargar_grupo, modelo, ensamble, anios, **parametros)
 
-        return ("descargado", f"Datasets descargados: {len(datasets)} (grid_label={gl})")
 
+async def procesar_tareas(
+    tareas: list[TareaDescarga],
+    indice_salida: set[tuple[str, str, str]],
+    concurrencia: int,
+    logger: logging.Logger,
+    **parametros: Any,
+) -> list[Resultado]:
+    """Descarga las tareas en paralelo con como maximo `concurrencia` grupos a la vez.
+
+    Las tareas pendientes se agrupan por (modelo, ensamble): cada grupo es una
+    sola busqueda en ESGF. Los resultados se devuelven en el mismo orden que `tareas`.
+    """
+    semaforo = asyncio.Semaphore(concurrencia)
+    resultados: list[Resultado] = [("", "", "", "", "")] * len(tareas)
+
+    # (modelo, ensamble) -> indices en `tareas` de los anios a descargar
+    grupos: dict[tuple[str, str], list[int]] = defaultdict(list)
+    for i, tarea in enumerate(tareas):
+        if ya_existe_en_salida(tarea, indice_salida):
+            resultados[i] = (
+                tarea.modelo,
+                tarea.ensamble,
+                tarea.anio,
+                "ya_existe",
+                "Ya habia al menos un .nc en destino.",
+            )
+        else:
+            grupos[(tarea.modelo, tarea.ensamble)].append(i)
+
+    async def _acotada(n: int, modelo: str, ensamble: str, indices: list[int]) -> None:
+        anios = [tareas[i].anio for i in indices]
+        async with semaforo:
+            logger.info(
+                "[%d/%d] %s | %s | %s",
+                n,
+                len(grupos),
+                modelo,
+                ensamble,
+                ",".join(tareas[i].sub_experiment_id for i in indices),
+            )
+            estados = await descargar_grupo_async(modelo, ensamble, anios, **parametros)
+
+        for i, anio in zip(indices, anios):
+            estado, detalle = estados[anio]
+            resultados[i] = (modelo, ensamble, anio, estado, detalle)
+
+    async with asyncio.TaskGroup() as grupo:
+        for n, ((modelo, ensamble), indices) in enumerate(grupos.items(), start=1):
+            grupo.create_task(_acotada(n, modelo, ensamble, indices))
+
+    return resultados
+
+
+def mover_archivo(origen: str | Path, destino: Path, mismo_dispositivo: bool) -> None:
+    """Mueve `origen` a `destino`.
+
+    En el mismo volumen es un unico os.replace. Entre volumenes (o si el
+    renombrado falla con EXDEV) se copia con copy2, conservando fechas y
+    permisos, a un temporal junto al destino y se renombra, para no dejar
+    un .nc a medias; despues se borra el origen.
+    """
+    if mismo_dispositivo:
+        try:
+            os.replace(origen, destino)
+            return
+        except OSError as exc:
+            if exc.errno != errno.EXDEV:
+                raise
+
+    temporal = destino.with_name(destino.name + ".part")
     try:
-        estado, detalle = _intentar_descarga(grid_label)
+        shutil.copy2(origen, temporal)
+        os.replace(temporal, destino)
+    except BaseException:
+        temporal.unlink(missing_ok=True)
+        raise
+    os.unlink(origen)
 
-        # Fallback gn → gr si no hay resultados
-        if estado == "sin_resultados" and grid_label == "gn":
-            estado, detalle = _intentar_descarga("gr")
 
-        return (estado, detalle)
+def _mover_uno(par: tuple[str, Path], mismo_dispositivo: bool) -> str:
+    """Mueve un par (origen, destino) y devuelve 'movido' o 'error'.
 
-    except Exception as exc:
-        return ("error", f"{type(exc).__name__}: {exc}")
+    Cada hilo solo devuelve su resultado; el recuento se hace al final con un
+    Counter, sin contadores compartidos entre hilos.
+    """
+    origen, destino = par
+    try:
+        mover_archivo(origen, destino, mismo_dispositivo)
+        return "movido"
+    except Exception:
+        return "error"
 
 
 def mover_nc_cache_a_salida(cache_dir: Path, salida_dir: Path) -> tuple[int, int, int]:
@@ -156,51 +369,65 @@ def mover_nc_cache_a_salida(cache_dir: Path, salida_dir: Path) -> tuple[int, int
     omitidos = 0
     errores = 0
 
-    for archivo in cache_dir.rglob("*.nc"):
+    mismo_dispositivo = os.stat(cache_dir).st_dev == os.stat(salida_dir).st_dev
+
+    # 1. Planificar (origen, destino) en serie; los movimientos van despues en paralelo
+    pendientes: list[tuple[str, Path]] = []
+    planificados: set[Path] = set()
+    for entrada in walk_nc(str(cache_dir)):
         try:
-            partes_nombre = archivo.name.split("_")
-            if len(partes_nombre) < 3:
-                errores += 1
-                continue
-            modelo = partes_nombre[2]
-
-            sub_exp = None
-            ensamble = None
-            for parte in reversed(archivo.parts):
-                match = PATRON_MEMBER_CARPETA.match(parte)
-                if match:
-                    sub_exp = match.group(1)
-                    ensamble = match.group(2)
-                    break
-
-            if not sub_exp or not ensamble:
+            match = PATRON_NOMBRE_ARCHIVO.match(entrada.name)
+            if not match:
                 errores += 1
                 continue
+            modelo, sub_exp, ensamble = match.groups()
 
-            destino_dir = salida_dir / modelo / ensamble / sub_exp
-            destino_dir.mkdir(parents=True, exist_ok=True)
-            destino = destino_dir / archivo.name
+            destino = salida_dir / modelo / ensamble / sub_exp / entrada.name
 
-            if destino.exists():
+            # Si otro .nc de la cache ya va a este destino, se omite como si existiera
+            if destino in planificados or destino.exists():
                 omitidos += 1
                 continue
 
-            shutil.move(str(archivo), str(destino))
-            movidos += 1
+            planificados.add(destino)
+            pendientes.append((entrada.path, destino))
 
         except Exception:
             errores += 1
 
+    # 2. Crear las carpetas destino una sola vez por carpeta distinta
+    carpetas_fallidas: set[Path] = set()
+    for carpeta in {destino.parent for _, destino in pendientes}:
+        try:
+            carpeta.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            carpetas_fallidas.add(carpeta)
+    if carpetas_fallidas:
+        errores += sum(1 for _, destino in pendientes if destino.parent in carpetas_fallidas)
+        pendientes = [
+            (origen, destino)
+            for origen, destino in pendientes
+            if destino.parent not in carpetas_fallidas
+        ]
+
+    # 3. Mover. Entre volumenes cada movimiento es una copia: en serie para no saturar el disco
+    hilos = HILOS_MOVIMIENTO if mismo_dispositivo else 1
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        conteo = Counter(
+            executor.map(partial(_mover_uno, mismo_dispositivo=mismo_dispositivo), pendientes)
+        )
+    movidos += conteo["movido"]
+    errores += conteo["error"]
+
     return (movidos, omitidos, errores)
 
 
-def guardar_reporte(resultados: list[dict[str, str | int]], salida_csv: Path) -> None:
+def guardar_reporte(resultados: list[Resultado], salida_csv: Path) -> None:
     salida_csv.parent.mkdir(parents=True, exist_ok=True)
-    campos = ["modelo", "ensamble", "anio", "estado", "detalle"]
-    with salida_csv.open("w", encoding="utf-8", newline="") as archivo:
-        writer = csv.DictWriter(archivo, fieldnames=campos)
-        writer.writeheader()
-        writer.writerows(resultados)
+    with salida_csv.open(
+        "w", encoding="utf-8", newline="", buffering=BUFFER_CSV
+    ) as archivo:
+        csv.writer(archivo).writerows([CAMPOS_REPORTE, *resultados])
 
 
 def main() -> None:
@@ -247,7 +474,15 @@ def main() -> None:
         default=None,
         help="Texto opcional para filtrar modelos (ej: MIROC).",
     )
+    parser.add_argument(
+        "--concurrencia",
+        type=int,
+        default=5,
+        help="Numero maximo de descargas simultaneas (default: 5).",
+    )
     args = parser.parse_args()
+    if args.concurrencia < 1:
+        parser.error("--concurrencia debe ser >= 1")
 
     logger = configurar_logger()
 
@@ -260,8 +495,6 @@ def main() -> None:
     cache_dir.mkdir(parents=True, exist_ok=True)
     salida_dir.mkdir(parents=True, exist_ok=True)
 
-    intake_esgf.conf.set(local_cache=str(cache_dir))
-
     tareas = leer_tareas_desde_csv(ruta_csv, args.filtro_modelo)
     if not tareas:
         logger.info("No hay tareas para descargar.")
@@ -269,52 +502,44 @@ def main() -> None:
 
     logger.info("Tareas a procesar: %d", len(tareas))
 
-    resultados: list[dict[str, str | int]] = []
-    for i, tarea in enumerate(tareas, start=1):
-        logger.info(
-            "[%d/%d] %s | %s | %s",
-            i,
-            len(tareas),
-            tarea.modelo,
-            tarea.ensamble,
-            tarea.sub_experiment_id,
-        )
+    # Import diferido: intake_esgf arrastra xarray, pandas, etc. y solo hace
+    # falta cuando de verdad hay algo que descargar
+    import intake_esgf
 
-        if ya_existe_en_salida(tarea, salida_dir):
-            resultados.append(
-                {
-                    "modelo": tarea.modelo,
-                    "ensamble": tarea.ensamble,
-                    "anio": tarea.anio,
-                    "estado": "ya_existe",
-                    "detalle": "Ya habia al menos un .nc en destino.",
-                }
-            )
-            continue
+    intake_esgf.conf.set(local_cache=str(cache_dir), break_on_error=False)
 
-        estado, detalle = descargar_tarea(
-            tarea=tarea,
+    resultados = asyncio.run(
+        procesar_tareas(
+            tareas,
+            construir_indice_salida(salida_dir),
+            args.concurrencia,
+            logger,
             experiment_id=args.experiment_id,
             table_id=args.table_id,
             variable_id=args.variable_id,
             grid_label=args.grid_label,
             latest=args.latest,
         )
+    )
 
-        movidos, omitidos, errores = mover_nc_cache_a_salida(cache_dir, salida_dir)
-        detalle_final = (
-            f"{detalle} | movidos={movidos}, omitidos={omitidos}, errores_mov={errores}"
-        )
-
-        resultados.append(
-            {
-                "modelo": tarea.modelo,
-                "ensamble": tarea.ensamble,
-                "anio": tarea.anio,
-                "estado": estado,
-                "detalle": detalle_final,
-            }
+    # Las descargas comparten cache_dir: se reorganiza una sola vez al final
+    movidos, omitidos, errores = mover_nc_cache_a_salida(cache_dir, salida_dir)
+    logger.info(
+        "Reorganizacion: movidos=%d, omitidos=%d, errores_mov=%d",
+        movidos,
+        omitidos,
+        errores,
+    )
+    # Los movimientos no se atribuyen a una tarea concreta: fila resumen de la ejecucion
+    resultados.append(
+        (
+            "",
+            "",
+            "",
+            "reorganizacion",
+            f"movidos={movidos}, omitidos={omitidos}, errores_mov={errores}",
         )
+    )
 
     ruta_reporte = Path(args.reporte)
     guardar_reporte(resultados, ruta_reporte)
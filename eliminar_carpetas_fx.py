@@ -1,39 +1,93 @@
 import os
 import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
 
+def _recolectar(raiz: str):
+    """
+    Recorre el árbol una sola vez con os.scandir y devuelve dos listas:
+      - Carpetas llamadas 'fx' (no se desciende en ellas: se borran enteras).
+      - Ficheros cuyo nombre contiene '_fx_'.
+    Las carpetas que no se pueden leer se saltan sin abortar el recorrido.
+    """
+    carpetas_fx = []
+    ficheros_fx = []
+    pendientes = [raiz]
+
+    while pendientes:
+        try:
+            entradas = os.scandir(pendientes.pop())
+        except OSError:
+            # Raíz inexistente o carpeta sin permisos: se omite, igual que rglob
+            continue
+        with entradas:
+            for entrada in entradas:
+                if entrada.is_dir(follow_symlinks=False):
+                    if entrada.name == "fx":
+                        carpetas_fx.append(entrada.path)
+                    else:
+                        pendientes.append(entrada.path)
+                elif "_fx_" in entrada.name and entrada.is_file(follow_symlinks=False):
+                    ficheros_fx.append(entrada.path)
+
+    return carpetas_fx, ficheros_fx
+
+
+def _eliminar(funcion, ruta: str, tipo: str):
+    """
+    Elimina `ruta` con `funcion`. Devuelve (éxito, líneas de log) para que
+    la salida se escriba de una vez al final, sin un print por fichero.
+    """
+    lineas = [f"[{tipo}] Eliminando: {ruta}"]
+    try:
+        funcion(ruta)
+        return True, lineas
+    except Exception as e:
+        lineas.append(f"  ✗ Error al eliminar {tipo.lower()} {ruta}: {e}")
+        return False, lineas
+
+
 def eliminar_carpetas_fx(directorio_base: str):
     """
     Busca y elimina de forma recursiva:
       - Todas las carpetas llamadas 'fx'.
       - Todos los ficheros cuyo nombre contenga '_fx_'.
+
+    El árbol se recorre una sola vez y los borrados se reparten en un
+    pool de hilos para solapar la latencia de cada llamada al sistema.
+    El registro de cada borrado se acumula y se escribe de una vez.
     """
     path_base = Path(directorio_base)
-    contador_carpetas = 0
-    contador_ficheros = 0
 
     print(f"Iniciando búsqueda en: {path_base}\n")
 
-    # ── 1. Carpetas llamadas 'fx' ────────────────────────────────────────────
-    for p in path_base.rglob("fx"):
-        if p.is_dir():
-            try:
-                print(f"[CARPETA] Eliminando: {p}")
-                shutil.rmtree(p)
-                contador_carpetas += 1
-            except Exception as e:
-                print(f"  ✗ Error al eliminar carpeta {p}: {e}")
-
-    # ── 2. Ficheros cuyo nombre contiene '_fx_' ──────────────────────────────
-    for p in path_base.rglob("*_fx_*"):
-        if p.is_file():
-            try:
-                print(f"[FICHERO] Eliminando: {p}")
-                p.unlink()
-                contador_ficheros += 1
-            except Exception as e:
-                print(f"  ✗ Error al eliminar fichero {p}: {e}")
+    carpetas_fx, ficheros_fx = _recolectar(str(path_base))
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        # ── 1. Carpetas llamadas 'fx' ────────────────────────────────────────
+        resultados_carpetas = executor.map(
+            partial(_eliminar, shutil.rmtree, tipo="CARPETA"), carpetas_fx
+        )
+        # ── 2. Ficheros cuyo nombre contiene '_fx_' ──────────────────────────
+        resultados_ficheros = executor.map(
+            partial(_eliminar, os.unlink, tipo="FICHERO"), ficheros_fx
+        )
+        resultados_carpetas = list(resultados_carpetas)
+        resultados_ficheros = list(resultados_ficheros)
+
+    contador_carpetas = sum(ok for ok, _ in resultados_carpetas)
+    contador_ficheros = sum(ok for ok, _ in resultados_ficheros)
+
+    lineas = [
+        linea
+        for _, lineas_ruta in resultados_carpetas + resultados_ficheros
+        for linea in lineas_ruta
+    ]
+    if lineas:
+        sys.stdout.write("\n".join(lineas) + "\n")
 
     print(
         f"\nProceso finalizado."
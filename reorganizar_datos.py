@@ -1,9 +1,22 @@
 import os
-import shutil
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
 import glob
 import re
 
+from descargar_faltantes import mover_archivo, walk_nc
+
+
+def try_move(src, dst, same_device):
+    """Mueve un archivo y devuelve None, o el mensaje de error si falla."""
+    try:
+        mover_archivo(src, dst, same_device)
+        return None
+    except Exception as e:
+        return f"Error moviendo {src}: {e}"
+
+
 def reorganizar_datos():
     # Directorio base donde están las carpetas descargadas
     base_dir = Path(r"f:\datos\Desktop\GIT\descargar_datos") 
@@ -22,7 +35,7 @@ def reorganizar_datos():
     files = []
     for d in source_dirs:
         print(f"Escaneando directorio: {d.name}...")
-        files.extend(list(d.rglob("*.nc")))
+        files.extend(Path(entry.path) for entry in walk_nc(str(d)))
 
     if not files:
         print("No se encontraron archivos .nc para mover.")
@@ -32,10 +45,18 @@ def reorganizar_datos():
     
     archivos_movidos = 0
     errores = 0
+
+    # Si origen y destino están en el mismo volumen los movimientos son renombrados
+    same_device = os.stat(base_dir).st_dev == os.stat(target_dir).st_dev
     
     # Regex para identificar la carpeta del member_id (ej: s1960-r10i1p1f1)
     # Debe empezar por s, seguir con 4 dígitos (año), un guion y luego la variante
     member_regex = re.compile(r"^(s\d{4})-(r.+)$")
+    # Caché carpeta contenedora -> (año, variante), o None si no hay carpeta member
+    member_by_dir = {}
+    # Movimientos pendientes (origen, destino) y destinos ya reservados
+    pending = []
+    planned = set()
 
     for file_path in files:
         try:
@@ -44,53 +65,80 @@ def reorganizar_datos():
             # 1. Extraer nombre del modelo del nombre del archivo
             # Formato típico: variable_table_model_experiment_member_grid_time.nc
             # Ejemplo: pr_Amon_MIROC6_dcppA-hindcast_s1960-r10i1p1f1_gn_196011-197012.nc
-            parts = filename.split('_')
-            if len(parts) > 2:
-                model_name = parts[2] # MIROC6, NorCPM1, etc.
-            else:
+            # El modelo es el tercer campo; partition evita construir la lista completa
+            model_name = filename.partition('_')[2].partition('_')[2].partition('_')[0]
+            if not model_name:
                 print(f"Advertencia: Formato de nombre de archivo no reconocido: {filename}. Saltando.")
                 errores += 1
                 continue
             
             # 2. Extraer Año y Variante de la ruta
-            # Buscamos en las partes de la ruta alguna carpeta que cumpla el patrón sYYYY-r...
-            year_folder = None
-            variant_folder = None
-            
-            # Iteramos las partes de la ruta en reverso para encontrar la carpeta member más cercana al archivo
-            for part in reversed(file_path.parts):
-                match = member_regex.match(part)
-                if match:
-                    year_folder = match.group(1) # s1960
-                    variant_folder = match.group(2) # r10i1p1f1
-                    break
+            # Todos los archivos de una misma carpeta comparten member, así que
+            # la búsqueda de la carpeta sYYYY-r... se hace una vez por directorio
+            parent = file_path.parent
+            if parent in member_by_dir:
+                member = member_by_dir[parent]
+            else:
+                member = None
+                # Primero las posiciones habituales (la carpeta del archivo, su padre y
+                # la carpeta member del DRS de ESGF: member/tabla/variable/grid/versión);
+                # si ninguna encaja, se recorre la ruta en reverso como último recurso
+                parts = parent.parts
+                for part in chain(parts[-1:], parts[-2:-1], parts[-5:-4], reversed(parts)):
+                    match = member_regex.match(part)
+                    if match:
+                        member = (match.group(1), match.group(2)) # (s1960, r10i1p1f1)
+                        break
+                member_by_dir[parent] = member
             
-            if not year_folder or not variant_folder:
+            if member is None:
                 print(f"Advertencia: No se pudo extraer año/variante de la ruta: {file_path}. Saltando.")
                 errores += 1
                 continue
+            year_folder, variant_folder = member
             
             # 3. Construir ruta destino
             # Estructura: datos / Modelo / Variante / Año / Archivo
             dest_folder = target_dir / model_name / variant_folder / year_folder
             dest_path = dest_folder / filename
             
-            # Crear carpeta destino
-            dest_folder.mkdir(parents=True, exist_ok=True)
-            
-            # 4. Mover archivo
-            if dest_path.exists():
+            # 4. Reservar el movimiento (se ejecutan todos después, en paralelo)
+            if dest_path in planned or dest_path.exists():
                 print(f"Advertencia: El archivo destino ya existe: {dest_path}. Saltando para evitar sobrescribir.")
                 errores += 1
             else:
-                shutil.move(str(file_path), str(dest_path))
-                archivos_movidos += 1
-                # print(f"Movido: {filename} -> {dest_folder}") # Comentado para no saturar consola si hay muchos
+                planned.add(dest_path)
+                pending.append((file_path, dest_path))
                 
         except Exception as e:
             print(f"Error moviendo {file_path}: {e}")
             errores += 1
 
+    # 5. Crear carpetas destino, una vez por carpeta distinta y fuera del bucle
+    failed_dirs = set()
+    for folder in {dst.parent for _, dst in pending}:
+        try:
+            folder.mkdir(parents=True, exist_ok=True)
+        except Exception as e:
+            print(f"Error creando carpeta destino {folder}: {e}")
+            failed_dirs.add(folder)
+    if failed_dirs:
+        errores += sum(1 for _, dst in pending if dst.parent in failed_dirs)
+        pending = [(src, dst) for src, dst in pending if dst.parent not in failed_dirs]
+
+    # 6. Mover archivos. En el mismo volumen son renombrados y se solapan bien en
+    # varios hilos; entre volúmenes son copias y se hacen de una en una
+    max_workers = 8 if same_device else 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(try_move, src, dst, same_device) for src, dst in pending]
+    for future in futures:
+        error = future.result()
+        if error is None:
+            archivos_movidos += 1
+        else:
+            print(error)
+            errores += 1
+
     print("-" * 30)
     print("Resumen de Reorganización:")
     print(f"Archivos procesados: {len(files)}")